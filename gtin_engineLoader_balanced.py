@@ -10,6 +10,11 @@ import concurrent.futures
 import threading
 import importlib.util
 import sys
+from collections import deque
+from contextlib import nullcontext
+
+from gtin_request_tracing import RequestTracer
+from gtin_traffic_recorder import TrafficRecorder
 
 # ==================== CONFIGURACIÓN DE FUENTE DE GTINS ====================
 # Opción 1: Usar GTINs del archivo extraído (recomendado para archivos grandes)
@@ -53,16 +58,51 @@ AUTH0_PAYLOAD = {
 TOTAL_GTINS_TO_PROCESS = 100  # Procesar máximo 1000 GTINs (ajustable automáticamente)
 NUM_WORKERS = 4               # Reducir a 8 workers (1 por CPU lógico) - 
 MAX_RETRIES = 4               # Mantener 4 reintentos -  
-TIMEOUT = 600                 # Aumentar a 600 segundos (10 minutos) -  
+TIMEOUT = 600                 # Tope del timeout de lectura: 600 segundos (10 minutos) -  
 NUM_CHUNKS = 3                # Mantener 5 chunks -  
 
+# Timeouts separados de conexión y lectura. Con ADAPTIVE_READ_TIMEOUT el timeout de lectura
+# (espera entre bytes, en la práctica hasta la respuesta del LLM) se calcula como
+# READ_TIMEOUT_P99_MULTIPLIER x p99 de las latencias exitosas recientes, entre READ_TIMEOUT_MIN y TIMEOUT.
+# Los intentos cortados no entran en el p99 (su duración es el propio timeout y lo realimentaría).
+# Si el backend se vuelve más lento, el timeout sube un paso de READ_TIMEOUT_STEP cuando más de
+# READ_TIMEOUT_SLOWDOWN_SHARE de los últimos READ_TIMEOUT_SLOWDOWN_WINDOW intentos se cortan, y
+# el reintento de un GTIN cortado usa un paso más (nunca más de un paso por GTIN)
+CONNECT_TIMEOUT = 10          # Una conexión muerta libera el worker en 10 segundos
+ADAPTIVE_READ_TIMEOUT = True
+READ_TIMEOUT_P99_MULTIPLIER = 3
+READ_TIMEOUT_MIN = 60         # Nunca cortar antes de 60 segundos
+ADAPTIVE_MIN_SAMPLES = 20     # Usar TIMEOUT hasta tener 20 latencias exitosas
+ADAPTIVE_WINDOW = 500         # Latencias recientes consideradas para el p99
+READ_TIMEOUT_STEP = 2         # Subida máxima del timeout de lectura por paso (x2)
+READ_TIMEOUT_SLOWDOWN_SHARE = 0.10   # Más de un 10% de intentos cortados = backend más lento
+READ_TIMEOUT_SLOWDOWN_WINDOW = 100   # Intentos considerados (como máximo un paso por ventana)
+
 # Pausa entre chunks (añadir esta variable) - EXACTO COMO ORIGINAL
 CHUNK_PAUSE = 5               # 5 segundos de pausa entre chunks (ventanas o lotes)
 
+# ==================== DEAD-LETTER Y RE-DRIVE ====================
+# Los GTINs que agotan MAX_RETRIES se guardan en dead_letter_<timestamp>.jsonl con su último
+# código de estado y tipo de error. El re-drive los reprocesa al final con menos concurrencia
+ENABLE_REDRIVE = True         # Reprocesar la dead-letter al terminar la corrida principal
+REDRIVE_WORKERS = 1           # Workers del re-drive (menos que NUM_WORKERS)
+REDRIVE_TIMEOUT = 1200        # Timeout más largo para los casos difíciles
+REDRIVE_FILE = None           # Ruta a un dead_letter_*.jsonl para reprocesar solo esos GTINs (sin corrida principal)
+
 # ==================== CONFIGURACIÓN DE RESULTADOS ====================
 RESULTS_DIR = "batch_comparison_results"
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
+# Trazas por fase (connect, send, ttfb, download, retry-wait, csv-write) por GTIN y worker
+# Se exportan como trace_<timestamp>.json para chrome://tracing o ui.perfetto.dev
+ENABLE_TRACING = False
+TRACER = RequestTracer() if ENABLE_TRACING else None
+
+# Grabación del flujo de peticiones (GTIN, payload, instante de envío y resultado) en
+# traffic_<timestamp>.jsonl.gz, para reproducirlo con gtin_traffic_replay.py
+RECORD_TRAFFIC = False
+RECORDER = None               # TrafficRecorder activo (se crea en main si RECORD_TRAFFIC)
+
 # Lock para sincronización de hilos
 log_lock = threading.Lock()
 
@@ -79,6 +119,10 @@ def log_message(message):
         with open(log_file, "a") as f:
             f.write(f"[{timestamp}] {message}\n")
 
+def trace_span(name, **args):
+    """Devuelve un span de traza si el trazado está activo, o un contexto vacío"""
+    return TRACER.span(name, **args) if TRACER else nullcontext()
+
 def load_gtins_from_extracted_file():
     """
     Carga GTINs desde el archivo generado por el extractor
@@ -200,32 +244,64 @@ def get_auth_token():
         log_message(f"❌ Error en la solicitud de autenticación: {str(e)}")
         return None
 
-def process_single_gtin(gtin, retry_count=0):
-    """Procesa un solo GTIN y devuelve el resultado con tiempo de procesamiento"""
+def classify_failure(status_code, response_text, exception=None):
+    """
+    Clasifica el fallo de un intento para la dead-letter
+    
+    Returns:
+        str: Tipo de error (clase de la excepción, "QueuePool" o "HTTP <código>")
+    """
+    if exception is not None:
+        return type(exception).__name__
+    if is_queue_pool_error(status_code, response_text):
+        return "QueuePool"
+    return f"HTTP {status_code}"
+
+def process_single_gtin(gtin, retry_count=0, timeout=None, read_timeouts=0):
+    """
+    Procesa un solo GTIN y devuelve el resultado con tiempo de procesamiento
+    
+    Usa CONNECT_TIMEOUT para conectar y como timeout de lectura el valor fijo `timeout`
+    si se proporciona, o el adaptativo de TIMEOUTS, un paso más alto si alguno de los
+    intentos anteriores de este GTIN (`read_timeouts`) se cortó por timeout de lectura.
+    
+    Returns:
+        tuple: (éxito, gtin, código de estado, tiempo, texto de respuesta, tipo de error o None)
+    """
     start_time = time.time()
+    adaptive = timeout is None
+    timeout = TIMEOUTS.get(timeout, read_timeouts)
+    
+    # Usar el mismo payload que en Postman
+    payload = {
+        "gtin": gtin,
+        "gln": "0000000000000",
+        "reprocess": True  # Garantiza que se traiga la descripción de nuevo
+    }
     
     try:
-        # Usar el mismo payload que en Postman
-        payload = {
-            "gtin": gtin,
-            "gln": "0000000000000",
-            "reprocess": True  # Garantiza que se traiga la descripción de nuevo
-        }
-        
         # Usar POST con el mismo formato que en Postman
-        response = requests.post(
-            API_URL,
-            headers=HEADERS,
-            json=payload,
-            timeout=TIMEOUT
-        )
+        if TRACER:
+            with TRACER.context(gtin=gtin, attempt=retry_count), TRACER.span("request"):
+                response = TRACER.post(API_URL, headers=HEADERS, json=payload, timeout=timeout)
+        else:
+            response = requests.post(
+                API_URL,
+                headers=HEADERS,
+                json=payload,
+                timeout=timeout
+            )
         
         processing_time = time.time() - start_time
         
         # Registrar resultado
         if 200 <= response.status_code < 300:
             log_message(f"✅ GTIN {gtin} procesado con éxito en {processing_time:.2f}s")
-            return True, gtin, response.status_code, processing_time, response.text
+            # Solo las peticiones con timeout adaptativo alimentan su distribución
+            if adaptive:
+                TIMEOUTS.observe(processing_time)
+            record_traffic(gtin, payload, start_time, retry_count, response.status_code, processing_time, None)
+            return True, gtin, response.status_code, processing_time, response.text, None
         else:
             log_message(f"❌ Error en GTIN {gtin}: {response.status_code}")
             try:
@@ -236,38 +312,270 @@ def process_single_gtin(gtin, retry_count=0):
                     log_message(f"🔄 Detectado error de pool de conexiones para GTIN {gtin}")
             except:
                 error_text = "No se pudo obtener texto de respuesta"
-            return False, gtin, response.status_code, processing_time, error_text
+            error_class = classify_failure(response.status_code, error_text)
+            record_traffic(gtin, payload, start_time, retry_count, response.status_code, processing_time, error_class)
+            return False, gtin, response.status_code, processing_time, error_text, error_class
         
     except Exception as e:
         processing_time = time.time() - start_time
         error_msg = str(e)
         log_message(f"❌ Error procesando GTIN {gtin}: {error_msg}")
-        return False, gtin, None, processing_time, error_msg
+        timeout_kind = TIMEOUTS.record_timeout(e)
+        if timeout_kind:
+            log_message(f"⏱️  Timeout de {'conexión' if timeout_kind == 'connect' else 'lectura'} "
+                        f"({timeout[0 if timeout_kind == 'connect' else 1]:.1f}s) para GTIN {gtin}")
+        if timeout_kind == 'read' and adaptive:
+            TIMEOUTS.observe_read_timeout()
+        error_class = classify_failure(None, error_msg, e)
+        record_traffic(gtin, payload, start_time, retry_count, None, processing_time, error_class)
+        return False, gtin, None, processing_time, error_msg, error_class
 
-def process_gtin_with_retry(gtin):
-    """Procesa un GTIN con reintentos en caso de fallo"""
+def is_queue_pool_error(status_code, response_text):
+    """Indica si la respuesta corresponde a un error de pool de conexiones del backend"""
+    return status_code == 500 and isinstance(response_text, str) and "QueuePool limit" in response_text
+
+def compute_retry_wait(retry, status_code, response_text):
+    """
+    Calcula la espera antes del siguiente reintento
+    
+    Args:
+        retry: Número de intento que acaba de fallar (0 = primer intento)
+        status_code: Código de estado devuelto (None si hubo excepción)
+        response_text: Texto de la respuesta o mensaje de error
+        
+    Returns:
+        int: Segundos de espera
+    """
+    # Backoff exponencial para errores de pool de conexiones
+    if is_queue_pool_error(status_code, response_text):
+        return min(30, (2 ** retry) * 5)  # 5s, 10s, 20s con máximo de 30s
+    return (retry + 1) * 3  # Espera progresiva: 3s, 6s, 9s...
+
+def process_gtin_with_retry(gtin, timeout=None, dead_letter=None):
+    """
+    Procesa un GTIN con reintentos en caso de fallo
+    
+    Args:
+        gtin: GTIN a procesar
+        timeout: Timeout de lectura fijo de cada petición (por defecto el adaptativo)
+        dead_letter: DeadLetterQueue donde registrar el GTIN si se agotan los reintentos (opcional)
+    """
+    read_timeouts = 0
     for retry in range(MAX_RETRIES):
-        success, gtin, status_code, processing_time, response_text = process_single_gtin(gtin, retry)
+        success, gtin, status_code, processing_time, response_text, error_class = process_single_gtin(gtin, retry, timeout, read_timeouts)
         if success:
             return success, gtin, status_code, processing_time, retry, response_text
         
+        # Una generación lenta pero válida no debe cortarse igual en todos los intentos
+        if error_class == "ReadTimeout":
+            read_timeouts += 1
+        
         # Si falló pero aún tenemos reintentos, esperamos antes de reintentar
         if retry < MAX_RETRIES - 1:
-            # Backoff exponencial para errores de pool de conexiones
-            if status_code == 500 and isinstance(response_text, str) and "QueuePool limit" in response_text:
-                wait_time = min(30, (2 ** retry) * 5)  # 5s, 10s, 20s con máximo de 30s
+            wait_time = compute_retry_wait(retry, status_code, response_text)
+            if is_queue_pool_error(status_code, response_text):
                 log_message(f"⏱️  Error de pool de conexiones. Esperando {wait_time}s antes de reintentar GTIN {gtin}")
-            else:
-                wait_time = (retry + 1) * 3  # Espera progresiva: 3s, 6s, 9s...
             
             log_message(f"🔄 Reintentando GTIN {gtin} en {wait_time} segundos (intento {retry+1}/{MAX_RETRIES})")
-            time.sleep(wait_time)
+            with trace_span("retry-wait", gtin=gtin, attempt=retry, wait=wait_time):
+                time.sleep(wait_time)
     
     # Si llegamos aquí, fallaron todos los intentos
+    if dead_letter is not None:
+        dead_letter.add(gtin, status_code, error_class, response_text, MAX_RETRIES)
     return False, gtin, status_code, processing_time, MAX_RETRIES - 1, response_text
 
-def process_chunk(chunk_gtins, chunk_id, results_file, global_start_time, processed_so_far=0, successful_so_far=0):
-    """Procesa un chunk de GTINs y devuelve estadísticas"""
+class AdaptiveTimeout:
+    """
+    Timeout de lectura adaptativo a partir de la distribución de latencias observada,
+    con conteo de timeouts de conexión y de lectura
+    """
+    def __init__(self, connect_timeout, max_read_timeout, min_read_timeout, multiplier, min_samples, window,
+                 step=2, slowdown_share=0.10, slowdown_window=100, enabled=True):
+        self.connect_timeout = connect_timeout
+        self.max_read_timeout = max_read_timeout
+        self.min_read_timeout = min_read_timeout
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.step = step
+        self.slowdown_share = slowdown_share
+        self.enabled = enabled
+        self._latencies = deque(maxlen=window)
+        # Resultado de los intentos adaptativos recientes (True = cortado por timeout de lectura)
+        self._outcomes = deque(maxlen=slowdown_window)
+        self._floor = min_read_timeout
+        self._read_timeout = max_read_timeout
+        self._timeout_counts = {'connect': 0, 'read': 0}
+        self._lock = threading.Lock()
+    
+    def observe(self, latency):
+        """Registra la latencia de una petición exitosa y recalcula el timeout de lectura"""
+        with self._lock:
+            self._latencies.append(latency)
+            self._outcomes.append(False)
+            self._update()
+    
+    def observe_read_timeout(self):
+        """
+        Registra un intento cortado por timeout de lectura. No entra en el p99: si la fracción
+        de intentos cortados en la ventana supera slowdown_share, el mínimo del timeout sube
+        un paso y la ventana empieza de nuevo
+        """
+        with self._lock:
+            self._outcomes.append(True)
+            window_full = len(self._outcomes) == self._outcomes.maxlen
+            if self.enabled and window_full and sum(self._outcomes) / len(self._outcomes) > self.slowdown_share:
+                self._floor = min(self.max_read_timeout, self._read_timeout * self.step)
+                self._outcomes.clear()
+                self._update()
+    
+    def _update(self):
+        """Recalcula el timeout de lectura (requiere el lock)"""
+        if self.enabled and len(self._latencies) >= self.min_samples:
+            p99 = statistics.quantiles(self._latencies, n=100)[98]
+            self._read_timeout = min(self.max_read_timeout, max(self._floor, p99 * self.multiplier))
+    
+    @property
+    def read_timeout(self):
+        """Timeout de lectura actual en segundos"""
+        with self._lock:
+            return self._read_timeout
+    
+    def get(self, read_timeout=None, read_timeouts=0):
+        """
+        Devuelve el timeout para requests
+        
+        Args:
+            read_timeout: Timeout de lectura fijo (opcional, sustituye al adaptativo)
+            read_timeouts: Intentos anteriores del GTIN cortados por timeout de lectura; si hay
+                alguno, el timeout adaptativo sube un paso (uno solo), hasta el máximo
+            
+        Returns:
+            tuple: (timeout de conexión, timeout de lectura)
+        """
+        if read_timeout is not None:
+            return self.connect_timeout, read_timeout
+        if read_timeouts:
+            return self.connect_timeout, min(self.max_read_timeout, self.read_timeout * self.step)
+        return self.connect_timeout, self.read_timeout
+    
+    def record_timeout(self, exception):
+        """
+        Cuenta la excepción si es un timeout
+        
+        Returns:
+            str: "connect", "read" o None si no es un timeout
+        """
+        if isinstance(exception, requests.exceptions.ConnectTimeout):
+            kind = 'connect'
+        elif isinstance(exception, requests.exceptions.ReadTimeout):
+            kind = 'read'
+        else:
+            return None
+        
+        with self._lock:
+            self._timeout_counts[kind] += 1
+        return kind
+    
+    def take_timeout_counts(self):
+        """Devuelve los timeouts contados desde la última llamada y reinicia el conteo"""
+        with self._lock:
+            counts = dict(self._timeout_counts)
+            self._timeout_counts = {'connect': 0, 'read': 0}
+        return counts
+
+TIMEOUTS = AdaptiveTimeout(
+    CONNECT_TIMEOUT, TIMEOUT, READ_TIMEOUT_MIN, READ_TIMEOUT_P99_MULTIPLIER,
+    ADAPTIVE_MIN_SAMPLES, ADAPTIVE_WINDOW, step=READ_TIMEOUT_STEP,
+    slowdown_share=READ_TIMEOUT_SLOWDOWN_SHARE, slowdown_window=READ_TIMEOUT_SLOWDOWN_WINDOW,
+    enabled=ADAPTIVE_READ_TIMEOUT
+)
+
+def record_traffic(gtin, payload, sent_at, attempt, status_code, latency, error_class):
+    """Registra un intento en la grabación de tráfico si está activa"""
+    recorder = RECORDER  # stop_traffic_recording puede anularlo desde otro hilo
+    if recorder:
+        recorder.record(gtin, payload, sent_at, attempt, status_code, latency, error_class)
+
+def start_traffic_recording(timestamp):
+    """Activa la grabación de tráfico de la corrida si RECORD_TRAFFIC está activo"""
+    global RECORDER
+    if RECORD_TRAFFIC:
+        RECORDER = TrafficRecorder(
+            os.path.join(RESULTS_DIR, f"traffic_{timestamp}.jsonl.gz"), API_URL,
+            workers=NUM_WORKERS, max_retries=MAX_RETRIES
+        )
+        log_message(f"🎙️  Grabando tráfico en: {RECORDER.path}")
+
+def stop_traffic_recording():
+    """Cierra la grabación de tráfico activa"""
+    global RECORDER
+    if RECORDER:
+        RECORDER.close()
+        log_message(f"🎙️  {RECORDER.count:,} peticiones grabadas en: {RECORDER.path}")
+        RECORDER = None
+
+class DeadLetterQueue:
+    """
+    Archivo JSONL con los GTINs que agotaron sus reintentos (una línea por GTIN)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def add(self, gtin, status_code, error_class, error_text, attempts):
+        """Registra un GTIN fallido; el archivo se crea con la primera entrada"""
+        entry = {
+            "gtin": gtin,
+            "status_code": status_code,
+            "error_class": error_class,
+            "error": error_text[:200] if isinstance(error_text, str) else None,
+            "attempts": attempts,
+            "timestamp": datetime.now().isoformat(timespec='seconds')
+        }
+        
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.count += 1
+    
+    @staticmethod
+    def load(path):
+        """
+        Lee una dead-letter
+        
+        Returns:
+            list: Entradas en orden de llegada, una por GTIN (se conserva la última)
+        """
+        entries = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries.pop(entry["gtin"], None)
+                    entries[entry["gtin"]] = entry
+        return list(entries.values())
+
+def write_result_row(results_file, gtin, success, status_code, processing_time, retries,
+                     elapsed_so_far, processed_total, successful_total, chunk_label):
+    """Añade la fila de resultado de un GTIN al CSV"""
+    with trace_span("csv-write", gtin=gtin), open(results_file, 'a', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow([
+            gtin, 'Sí' if success else 'No', status_code, f"{processing_time:.2f}",
+            retries, f"{elapsed_so_far:.2f}", processed_total,
+            successful_total, chunk_label
+        ])
+
+def process_chunk(chunk_gtins, chunk_id, results_file, global_start_time, processed_so_far=0, successful_so_far=0,
+                  num_workers=None, timeout=None, dead_letter=None):
+    """
+    Procesa un chunk de GTINs y devuelve estadísticas
+    
+    num_workers por defecto es NUM_WORKERS y timeout (lectura) el adaptativo; los GTINs que agotan
+    sus reintentos se registran en dead_letter si se proporciona.
+    """
     log_message(f"🚀 Iniciando procesamiento del chunk {chunk_id} con {len(chunk_gtins)} GTINs")
     
     # Contadores para este chunk
@@ -280,9 +588,12 @@ def process_chunk(chunk_gtins, chunk_id, results_file, global_start_time, proces
     retry_counts = []
     
     # Usar ThreadPoolExecutor para procesar los GTINs en paralelo
-    with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers or NUM_WORKERS) as executor:
         # Crear un futuro para cada GTIN en el chunk
-        future_to_gtin = {executor.submit(process_gtin_with_retry, gtin): gtin for gtin in chunk_gtins}
+        future_to_gtin = {
+            executor.submit(process_gtin_with_retry, gtin, timeout, dead_letter): gtin
+            for gtin in chunk_gtins
+        }
         
         for future in concurrent.futures.as_completed(future_to_gtin):
             gtin = future_to_gtin[future]
@@ -304,13 +615,10 @@ def process_chunk(chunk_gtins, chunk_id, results_file, global_start_time, proces
                 elapsed_so_far = time.time() - global_start_time
                 
                 # Guardar resultado en CSV
-                with open(results_file, 'a', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow([
-                        gtin, 'Sí' if success else 'No', status_code, f"{processing_time:.2f}",
-                        retries, f"{elapsed_so_far:.2f}", processed_so_far + processed_count, 
-                        successful_so_far + successful_count, f"Chunk {chunk_id}"
-                    ])
+                write_result_row(
+                    results_file, gtin, success, status_code, processing_time, retries, elapsed_so_far,
+                    processed_so_far + processed_count, successful_so_far + successful_count, f"Chunk {chunk_id}"
+                )
                 
                 # Mostrar progreso
                 if processed_count % 5 == 0 or processed_count == len(chunk_gtins):
@@ -332,6 +640,89 @@ def process_chunk(chunk_gtins, chunk_id, results_file, global_start_time, proces
         'retries': retry_counts
     }
 
+def split_into_chunks(gtins, num_chunks):
+    """
+    Divide la lista de GTINs en chunks de tamaño fijo (el último puede ser menor)
+    
+    Returns:
+        list: Lista de chunks
+        int: Tamaño de cada chunk
+    """
+    chunk_size = max(1, len(gtins) // num_chunks)
+    chunks = [gtins[i:i + chunk_size] for i in range(0, len(gtins), chunk_size)]
+    return chunks, chunk_size
+
+def format_count(value):
+    """Formatea un conteo con separador de miles (o lo deja tal cual si no es numérico)"""
+    return f"{value:,}" if isinstance(value, int) else str(value)
+
+def init_results_file(results_file, source_description, available_gtins, total_gtins, num_chunks=NUM_CHUNKS,
+                      num_workers=NUM_WORKERS, timeout=TIMEOUT, adaptive_timeout=ADAPTIVE_READ_TIMEOUT):
+    """
+    Crea el CSV de resultados con la cabecera y la configuración de la corrida,
+    y su sidecar JSON con la configuración y la posición de las filas de datos
+    """
+    # Agregar información de la fuente
+    preamble = [
+        [],
+        [f"Fuente de GTINs: {source_description}"],
+        [f"GTINs disponibles: {format_count(available_gtins)}"],
+        [f"GTINs a procesar: {format_count(total_gtins)}"],
+        [f"Workers: {num_workers}"],
+        [f"Chunks: {format_count(num_chunks)}"],
+        [f"Max reintentos: {MAX_RETRIES}"],
+        [f"Timeout: {timeout}s"],
+        [f"Timeout de conexión: {CONNECT_TIMEOUT}s"],
+        [f"Timeout de lectura adaptativo: {'Sí' if adaptive_timeout else 'No'}"],
+        [f"Pausa entre chunks: {CHUNK_PAUSE}s"],
+        []
+    ]
+    
+    with open(results_file, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow([
+            'GTIN', 'Éxito', 'Código de Estado', 'Tiempo (s)', 'Reintentos', 
+            'Tiempo Total Acumulado (s)', 'GTINs Procesados', 'GTINs Exitosos', 'Chunk'
+        ])
+        writer.writerows(preamble)
+    
+    write_run_sidecar(
+        results_file,
+        results_file=os.path.basename(results_file),
+        created=datetime.now().isoformat(timespec='seconds'),
+        source=source_description,
+        config={
+            'available_gtins': available_gtins,
+            'total_gtins': total_gtins,
+            'workers': num_workers,
+            'chunks': num_chunks,
+            'max_retries': MAX_RETRIES,
+            'timeout': timeout,
+            'connect_timeout': CONNECT_TIMEOUT,
+            'adaptive_read_timeout': adaptive_timeout,
+            'chunk_pause': CHUNK_PAUSE
+        },
+        # Línea (0 = cabecera) donde empiezan los datos: pd.read_csv(skiprows=range(1, data_start_row))
+        data_start_row=len(preamble) + 1,
+        data_rows=0
+    )
+
+def get_sidecar_path(results_file):
+    """Ruta del sidecar JSON de un CSV de resultados"""
+    return os.path.splitext(results_file)[0] + ".json"
+
+def write_run_sidecar(csv_path, **fields):
+    """Añade o actualiza campos en el sidecar JSON de un CSV de resultados"""
+    sidecar_file = get_sidecar_path(csv_path)
+    sidecar = {}
+    if os.path.exists(sidecar_file):
+        with open(sidecar_file, encoding="utf-8") as f:
+            sidecar = json.load(f)
+    
+    sidecar.update(fields)
+    with open(sidecar_file, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False, indent=2)
+
 def generate_processing_charts(gtin_times, retry_counts, timestamp, source_description):
     """Genera gráficos del procesamiento"""
     try:
@@ -375,106 +766,9 @@ def generate_processing_charts(gtin_times, retry_counts, timestamp, source_descr
     except Exception as e:
         log_message(f"⚠️  Error generando gráficos: {str(e)}")
 
-def main():
-    log_message("🚀 ===== INICIANDO SISTEMA DE PROCESAMIENTO MEJORADO =====")
-    
-    # Obtener token de autenticación
-    global HEADERS
-    HEADERS = get_auth_token()
-    if not HEADERS:
-        log_message("❌ No se pudo obtener el token de autenticación. Saliendo...")
-        return
-    
-    # Obtener GTINs a procesar
-    gtins_to_process, source_description = get_gtins_to_process()
-    total_gtins = len(gtins_to_process)
-    
-    log_message(f"📋 Fuente de GTINs: {source_description}")
-    log_message(f"📊 Total de GTINs disponibles: {total_gtins:,}")
-    
-    if total_gtins == 0:
-        log_message("❌ No hay GTINs para procesar. Saliendo...")
-        return
-    
-    # APLICAR LÍMITE DE TOTAL_GTINS_TO_PROCESS COMO EN EL SCRIPT ORIGINAL
-    if total_gtins > TOTAL_GTINS_TO_PROCESS:
-        log_message(f"⚠️  Limitando procesamiento a {TOTAL_GTINS_TO_PROCESS:,} GTINs (configurado en TOTAL_GTINS_TO_PROCESS)")
-        gtins_to_process = gtins_to_process[:TOTAL_GTINS_TO_PROCESS]
-        total_gtins = len(gtins_to_process)
-    
-    log_message(f"🎯 GTINs que se procesarán: {total_gtins:,}")
-    
-    # Crear archivo CSV para resultados
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    results_file = os.path.join(RESULTS_DIR, f"batch_processing_{timestamp}.csv")
-    
-    with open(results_file, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow([
-            'GTIN', 'Éxito', 'Código de Estado', 'Tiempo (s)', 'Reintentos', 
-            'Tiempo Total Acumulado (s)', 'GTINs Procesados', 'GTINs Exitosos', 'Chunk'
-        ])
-        # Agregar información de la fuente
-        writer.writerow([])
-        writer.writerow([f"Fuente de GTINs: {source_description}"])
-        writer.writerow([f"GTINs disponibles: {len(gtins_to_process):,}"])
-        writer.writerow([f"GTINs a procesar: {total_gtins:,}"])
-        writer.writerow([f"Workers: {NUM_WORKERS}"])
-        writer.writerow([f"Chunks: {NUM_CHUNKS}"])
-        writer.writerow([f"Max reintentos: {MAX_RETRIES}"])
-        writer.writerow([f"Timeout: {TIMEOUT}s"])
-        writer.writerow([f"Pausa entre chunks: {CHUNK_PAUSE}s"])
-        writer.writerow([])
-    
-    log_message(f"⚙️  Configuración EXACTA como script original:")
-    log_message(f"   📊 Total GTINs a procesar: {total_gtins:,}")
-    log_message(f"   👥 Workers: {NUM_WORKERS}")
-    log_message(f"   📦 Chunks: {NUM_CHUNKS}")
-    log_message(f"   🔄 Max reintentos: {MAX_RETRIES}")
-    log_message(f"   ⏱️  Timeout: {TIMEOUT}s")
-    log_message(f"   ⏸️  Pausa entre chunks: {CHUNK_PAUSE}s")
-    
-    # Tiempo de inicio global
-    global_start_time = time.time()
-    
-    # Dividir los GTINs en chunks EXACTAMENTE COMO EN EL SCRIPT ORIGINAL
-    chunk_size = total_gtins // NUM_CHUNKS
-    chunks = [gtins_to_process[i:i + chunk_size] for i in range(0, total_gtins, chunk_size)]
-    
-    log_message(f"📦 Dividiendo {total_gtins:,} GTINs en {len(chunks)} chunks de ~{chunk_size} GTINs cada uno")
-    
-    # Contadores globales
-    total_processed = 0
-    total_successful = 0
-    total_failed = 0
-    all_times = []
-    all_retries = []
-    
-    # Procesar cada chunk secuencialmente
-    for i, chunk in enumerate(chunks):
-        chunk_id = i + 1
-        chunk_stats = process_chunk(chunk, chunk_id, results_file, global_start_time, total_processed, total_successful)
-        
-        # Actualizar contadores globales
-        total_processed += chunk_stats['processed']
-        total_successful += chunk_stats['successful']
-        total_failed += chunk_stats['failed']
-        all_times.extend(chunk_stats['times'])
-        all_retries.extend(chunk_stats['retries'])
-        
-        # Mostrar progreso global después de cada chunk
-        progress_pct = (total_processed / total_gtins) * 100
-        success_rate = (total_successful / total_processed) * 100 if total_processed > 0 else 0
-        log_message(f"🌍 Progreso global: {total_processed:,}/{total_gtins:,} ({progress_pct:.1f}%) - Éxito: {success_rate:.1f}%")
-        
-        # Pausa entre chunks
-        if i < len(chunks) - 1:  # No pausar después del último chunk
-            log_message(f"⏸️  Pausa de {CHUNK_PAUSE} segundos antes del siguiente chunk...")
-            time.sleep(CHUNK_PAUSE)
-    
-    # Calcular tiempo total de ejecución
-    total_execution_time = time.time() - global_start_time
-    
+def report_final_summary(results_file, timestamp, source_description, total_gtins, total_processed,
+                         total_successful, total_failed, total_execution_time, all_times, all_retries):
+    """Calcula las estadísticas finales, genera los gráficos y añade el resumen al log y al CSV"""
     # Calcular estadísticas de tiempo
     if all_times:
         time_stats = {
@@ -494,6 +788,9 @@ def main():
         'max_retries': max(all_retries) if all_retries else 0
     }
     
+    # Timeouts contados durante esta corrida
+    timeout_counts = TIMEOUTS.take_timeout_counts()
+    
     # Generar gráficos
     generate_processing_charts(all_times, all_retries, timestamp, source_description)
     
@@ -523,6 +820,11 @@ def main():
     log_message(f"   Promedio de reintentos por GTIN: {retry_stats['avg_retries']:.2f}")
     log_message(f"   Máximo de reintentos en un GTIN: {retry_stats['max_retries']}")
     
+    log_message(f"\n⏱️  Timeouts (intentos cortados):")
+    log_message(f"   De conexión ({CONNECT_TIMEOUT}s): {timeout_counts['connect']:,}")
+    log_message(f"   De lectura: {timeout_counts['read']:,}")
+    log_message(f"   Timeout de lectura adaptativo al final: {TIMEOUTS.read_timeout:.1f}s")
+    
     # Guardar el resumen en el archivo CSV
     with open(results_file, 'a', newline='') as csvfile:
         writer = csv.writer(csvfile)
@@ -537,8 +839,197 @@ def main():
         writer.writerow(["Tiempo promedio por GTIN", f"{time_stats['avg']:.2f} segundos"])
         if total_processed > 0:
             writer.writerow(["Tiempo estimado para 1000 GTINs", f"{(total_execution_time/total_processed)*1000/60:.2f} minutos"])
+        writer.writerow(["Timeouts de conexión", timeout_counts['connect']])
+        writer.writerow(["Timeouts de lectura", timeout_counts['read']])
+    
+    write_run_sidecar(
+        results_file,
+        data_rows=total_processed,
+        summary={
+            'processed': total_processed,
+            'successful': total_successful,
+            'failed': total_failed,
+            'execution_time': round(total_execution_time, 3),
+            'gtins_per_second': round(total_processed / total_execution_time, 4) if total_execution_time else 0,
+            'avg_time': round(time_stats['avg'], 3),
+            'median_time': round(time_stats['median'], 3),
+            'total_retries': retry_stats['total_retries'],
+            'connect_timeouts': timeout_counts['connect'],
+            'read_timeouts': timeout_counts['read'],
+            'final_read_timeout': round(TIMEOUTS.read_timeout, 3)
+        }
+    )
     
     log_message(f"\n📄 Resultados guardados en: {results_file}")
+
+def export_trace(timestamp):
+    """Exporta la traza de la corrida si el trazado está activo"""
+    if TRACER:
+        trace_file = os.path.join(RESULTS_DIR, f"trace_{timestamp}.json")
+        span_count = TRACER.export_chrome_trace(trace_file)
+        log_message(f"🧵 Traza de {span_count:,} spans guardada en: {trace_file}")
+
+def run_redrive(dead_letter_path, timestamp):
+    """
+    Reprocesa solo los GTINs de una dead-letter con REDRIVE_WORKERS y REDRIVE_TIMEOUT
+    
+    Los resultados van a redrive_<timestamp>.csv y los GTINs que siguen fallando a
+    dead_letter_<timestamp>_redrive.jsonl.
+    
+    Returns:
+        DeadLetterQueue: GTINs que siguen fallando (None si no había nada que reprocesar)
+    """
+    try:
+        entries = DeadLetterQueue.load(dead_letter_path)
+    except (OSError, ValueError) as e:
+        log_message(f"❌ Error leyendo dead-letter {dead_letter_path}: {str(e)}")
+        return None
+    
+    if not entries:
+        log_message(f"✅ Dead-letter vacía, nada que reprocesar: {dead_letter_path}")
+        return None
+    
+    gtins = [entry["gtin"] for entry in entries]
+    source_description = f"Re-drive de {dead_letter_path}"
+    redrive_timestamp = f"redrive_{timestamp}"
+    results_file = os.path.join(RESULTS_DIR, f"{redrive_timestamp}.csv")
+    still_failing = DeadLetterQueue(os.path.join(RESULTS_DIR, f"dead_letter_{timestamp}_redrive.jsonl"))
+    
+    log_message(f"\n♻️  ===== RE-DRIVE DE {len(gtins):,} GTINs FALLIDOS =====")
+    log_message(f"   👥 Workers: {REDRIVE_WORKERS}")
+    log_message(f"   ⏱️  Timeout: conexión {CONNECT_TIMEOUT}s, lectura {REDRIVE_TIMEOUT}s")
+    
+    init_results_file(results_file, source_description, len(gtins), len(gtins), num_chunks=1,
+                      num_workers=REDRIVE_WORKERS, timeout=REDRIVE_TIMEOUT, adaptive_timeout=False)
+    
+    start_time = time.time()
+    with trace_span("chunk", chunk="Re-drive", gtins=len(gtins)):
+        stats = process_chunk(gtins, "Re-drive", results_file, start_time, num_workers=REDRIVE_WORKERS,
+                              timeout=REDRIVE_TIMEOUT, dead_letter=still_failing)
+    
+    report_final_summary(
+        results_file, redrive_timestamp, source_description, len(gtins), stats['processed'],
+        stats['successful'], stats['failed'], time.time() - start_time, stats['times'], stats['retries']
+    )
+    
+    log_message(f"♻️  Re-drive: {stats['successful']:,} GTINs recuperados, {still_failing.count:,} siguen fallando")
+    if still_failing.count:
+        log_message(f"🪦 Dead-letter del re-drive: {still_failing.path}")
+    
+    return still_failing
+
+def main():
+    log_message("🚀 ===== INICIANDO SISTEMA DE PROCESAMIENTO MEJORADO =====")
+    
+    # Obtener token de autenticación
+    global HEADERS
+    HEADERS = get_auth_token()
+    if not HEADERS:
+        log_message("❌ No se pudo obtener el token de autenticación. Saliendo...")
+        return
+    
+    # Reprocesar solo una dead-letter existente, sin corrida principal
+    if REDRIVE_FILE:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        run_redrive(REDRIVE_FILE, timestamp)
+        export_trace(timestamp)
+        log_message("🎉 ===== FIN DE PROCESAMIENTO =====")
+        return
+    
+    # Obtener GTINs a procesar
+    gtins_to_process, source_description = get_gtins_to_process()
+    total_gtins = len(gtins_to_process)
+    
+    log_message(f"📋 Fuente de GTINs: {source_description}")
+    log_message(f"📊 Total de GTINs disponibles: {total_gtins:,}")
+    
+    if total_gtins == 0:
+        log_message("❌ No hay GTINs para procesar. Saliendo...")
+        return
+    
+    # APLICAR LÍMITE DE TOTAL_GTINS_TO_PROCESS COMO EN EL SCRIPT ORIGINAL
+    if total_gtins > TOTAL_GTINS_TO_PROCESS:
+        log_message(f"⚠️  Limitando procesamiento a {TOTAL_GTINS_TO_PROCESS:,} GTINs (configurado en TOTAL_GTINS_TO_PROCESS)")
+        gtins_to_process = gtins_to_process[:TOTAL_GTINS_TO_PROCESS]
+        total_gtins = len(gtins_to_process)
+    
+    log_message(f"🎯 GTINs que se procesarán: {total_gtins:,}")
+    
+    # Crear archivo CSV para resultados
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    results_file = os.path.join(RESULTS_DIR, f"batch_processing_{timestamp}.csv")
+    dead_letter = DeadLetterQueue(os.path.join(RESULTS_DIR, f"dead_letter_{timestamp}.jsonl"))
+    
+    init_results_file(results_file, source_description, len(gtins_to_process), total_gtins)
+    
+    log_message(f"⚙️  Configuración EXACTA como script original:")
+    log_message(f"   📊 Total GTINs a procesar: {total_gtins:,}")
+    log_message(f"   👥 Workers: {NUM_WORKERS}")
+    log_message(f"   📦 Chunks: {NUM_CHUNKS}")
+    log_message(f"   🔄 Max reintentos: {MAX_RETRIES}")
+    log_message(f"   ⏱️  Timeout: conexión {CONNECT_TIMEOUT}s, lectura "
+                f"{f'adaptativo (hasta {TIMEOUT}s)' if ADAPTIVE_READ_TIMEOUT else f'{TIMEOUT}s'}")
+    log_message(f"   ⏸️  Pausa entre chunks: {CHUNK_PAUSE}s")
+    
+    # Tiempo de inicio global
+    start_traffic_recording(timestamp)
+    global_start_time = time.time()
+    
+    # Dividir los GTINs en chunks EXACTAMENTE COMO EN EL SCRIPT ORIGINAL
+    chunks, chunk_size = split_into_chunks(gtins_to_process, NUM_CHUNKS)
+    
+    log_message(f"📦 Dividiendo {total_gtins:,} GTINs en {len(chunks)} chunks de ~{chunk_size} GTINs cada uno")
+    
+    # Contadores globales
+    total_processed = 0
+    total_successful = 0
+    total_failed = 0
+    all_times = []
+    all_retries = []
+    
+    # Procesar cada chunk secuencialmente. La grabación de tráfico se cierra aunque la
+    # corrida se interrumpa, para que el gzip quede completo
+    try:
+        for i, chunk in enumerate(chunks):
+            chunk_id = i + 1
+            with trace_span("chunk", chunk=chunk_id, gtins=len(chunk)):
+                chunk_stats = process_chunk(chunk, chunk_id, results_file, global_start_time, total_processed, total_successful,
+                                            dead_letter=dead_letter)
+            
+            # Actualizar contadores globales
+            total_processed += chunk_stats['processed']
+            total_successful += chunk_stats['successful']
+            total_failed += chunk_stats['failed']
+            all_times.extend(chunk_stats['times'])
+            all_retries.extend(chunk_stats['retries'])
+            
+            # Mostrar progreso global después de cada chunk
+            progress_pct = (total_processed / total_gtins) * 100
+            success_rate = (total_successful / total_processed) * 100 if total_processed > 0 else 0
+            log_message(f"🌍 Progreso global: {total_processed:,}/{total_gtins:,} ({progress_pct:.1f}%) - Éxito: {success_rate:.1f}%")
+            
+            # Pausa entre chunks
+            if i < len(chunks) - 1:  # No pausar después del último chunk
+                log_message(f"⏸️  Pausa de {CHUNK_PAUSE} segundos antes del siguiente chunk...")
+                with trace_span("chunk-pause", chunk=chunk_id):
+                    time.sleep(CHUNK_PAUSE)
+    finally:
+        stop_traffic_recording()
+    
+    # Calcular tiempo total de ejecución
+    total_execution_time = time.time() - global_start_time
+    
+    report_final_summary(
+        results_file, timestamp, source_description, total_gtins, total_processed,
+        total_successful, total_failed, total_execution_time, all_times, all_retries
+    )
+    
+    if dead_letter.count:
+        log_message(f"🪦 {dead_letter.count:,} GTINs enviados a dead-letter: {dead_letter.path}")
+        if ENABLE_REDRIVE:
+            run_redrive(dead_letter.path, timestamp)
+    
+    export_trace(timestamp)
     log_message("🎉 ===== FIN DE PROCESAMIENTO =====")
 
 if __name__ == "__main__":
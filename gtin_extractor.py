@@ -7,7 +7,8 @@ Optimizado para archivos grandes (24MB+, 90,000+ registros)
 import pandas as pd
 import math
 import os
-from typing import List, Iterator
+from typing import List, Iterator, Optional
+from openpyxl import load_workbook
 import logging
 
 # Configurar logging
@@ -27,6 +28,24 @@ class GTINExtractor:
         self.batch_size = batch_size
         self.gtins = []
         
+    @staticmethod
+    def clean_gtin(value) -> Optional[str]:
+        """
+        Limpia y valida un valor leído de la primera columna
+        
+        Returns:
+            str: GTIN limpio, o None si no parece un GTIN (números de 8-14 dígitos)
+        """
+        # Limpiar espacios y convertir a string
+        clean_gtin = str(value).strip()
+        
+        # Filtrar solo valores que parezcan GTINs (números de 8-14 dígitos)
+        if clean_gtin.isdigit() and 8 <= len(clean_gtin) <= 14:
+            return clean_gtin
+        
+        logger.warning(f"GTIN inválido ignorado: '{clean_gtin}'")
+        return None
+    
     def extract_gtins_from_excel(self) -> List[str]:
         """
         Extrae GTINs de la primera columna del archivo Excel
@@ -54,14 +73,9 @@ class GTINExtractor:
             # Limpiar GTINs (remover espacios, caracteres especiales)
             cleaned_gtins = []
             for gtin in raw_gtins:
-                # Limpiar espacios y convertir a string
-                clean_gtin = str(gtin).strip()
-                
-                # Filtrar solo valores que parezcan GTINs (números de 8-14 dígitos)
-                if clean_gtin.isdigit() and 8 <= len(clean_gtin) <= 14:
+                clean_gtin = self.clean_gtin(gtin)
+                if clean_gtin:
                     cleaned_gtins.append(clean_gtin)
-                else:
-                    logger.warning(f"GTIN inválido ignorado: '{clean_gtin}'")
             
             self.gtins = cleaned_gtins
             logger.info(f"Total de GTINs extraídos: {len(self.gtins)}")
@@ -72,6 +86,43 @@ class GTINExtractor:
             logger.error(f"Error al leer archivo Excel: {e}")
             raise
     
+    def iter_gtins_from_excel(self) -> Iterator[str]:
+        """
+        Lee la primera columna del archivo Excel fila a fila y va entregando los GTINs válidos
+        
+        A diferencia de extract_gtins_from_excel() no carga la hoja completa en memoria, así
+        que los GTINs pueden procesarse mientras el archivo todavía se está leyendo.
+        Los GTINs entregados no se acumulan en self.gtins para mantener la memoria acotada.
+        
+        Yields:
+            str: GTIN validado
+        """
+        logger.info(f"Leyendo archivo Excel en modo streaming: {self.excel_file_path}")
+        
+        workbook = load_workbook(self.excel_file_path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.worksheets[0]
+            rows = worksheet.iter_rows(min_col=1, max_col=1, values_only=True)
+            
+            # La primera fila es la cabecera, igual que en pd.read_excel
+            header = next(rows, None)
+            if header is not None:
+                logger.info(f"Procesando columna: '{header[0]}'")
+            
+            total_gtins = 0
+            for (value,) in rows:
+                if value is None:
+                    continue
+                
+                clean_gtin = self.clean_gtin(value)
+                if clean_gtin:
+                    total_gtins += 1
+                    yield clean_gtin
+            
+            logger.info(f"Total de GTINs extraídos: {total_gtins}")
+        finally:
+            workbook.close()
+    
     def create_batches(self, gtins: List[str] = None) -> Iterator[List[str]]:
         """
         Divide los GTINs en lotes del tamaño especificado
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Reporte comparativo de rendimiento entre corridas del procesador de GTINs
+Carga todas las corridas de batch_comparison_results, tabula throughput, percentiles,
+reintentos y configuración, y detecta regresiones de la última corrida frente a una base
+"""
+
+import glob
+import json
+import math
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import gtin_engineLoader_balanced as loader
+
+# ==================== CONFIGURACIÓN DEL REPORTE ====================
+RESULTS_GLOB = os.path.join(loader.RESULTS_DIR, "batch_processing_*.csv")
+
+# Corrida base para la comparación (nombre del CSV). None = la corrida anterior a la última
+BASELINE_RUN = None
+
+# Nivel de significancia y cambio relativo mínimo para considerar una regresión
+ALPHA = 0.05
+MIN_EFFECT = 0.10
+
+# GTINs completados por ventana para estimar la distribución de GTINs/s
+THROUGHPUT_WINDOW = 10
+
+# Nombres de las columnas de datos del CSV de resultados
+COLUMNS = ['gtin', 'success', 'status_code', 'time', 'retries', 'elapsed', 'processed', 'successful', 'chunk']
+
+
+def parse_preamble_config(values: pd.Series) -> dict:
+    """
+    Extrae la configuración de las filas "Clave: valor" de la cabecera de un CSV sin sidecar
+    """
+    keys = {
+        'Workers': 'workers',
+        'Chunks': 'chunks',
+        'Max reintentos': 'max_retries',
+        'Timeout': 'timeout',
+        'Pausa entre chunks': 'chunk_pause'
+    }
+    pairs = values.str.extract(r'^(?P<key>[^:]+): (?P<value>.*)$').dropna()
+    config = {}
+    for key, value in zip(pairs['key'], pairs['value']):
+        if key in keys:
+            value = value.rstrip('s').replace(',', '')
+            for convert in (int, float, str):
+                try:
+                    config[keys[key]] = convert(value)
+                    break
+                except ValueError:
+                    continue
+    return config
+
+
+def load_run(path: str):
+    """
+    Carga las filas de datos de una corrida de forma vectorizada
+
+    Si el sidecar JSON tiene el resumen final se leen directamente las filas de datos; si no
+    (corridas antiguas o interrumpidas) se lee el CSV completo y se filtran las filas cuyo
+    GTIN es numérico.
+
+    Returns:
+        dict: Metadatos de la corrida (config, summary, source...)
+        pd.DataFrame: Una fila por GTIN con las columnas de COLUMNS
+    """
+    meta = {}
+    sidecar_file = loader.get_sidecar_path(path)
+    if os.path.exists(sidecar_file):
+        with open(sidecar_file, encoding="utf-8") as f:
+            meta = json.load(f)
+
+    if 'summary' in meta:
+        df = pd.read_csv(
+            path, header=0, names=COLUMNS, dtype={'gtin': str, 'success': str, 'chunk': str},
+            skiprows=range(1, meta['data_start_row']), nrows=meta['data_rows']
+        )
+    else:
+        # Las filas con menos columnas (cabecera y resumen) se completan con NaN
+        raw = pd.read_csv(path, header=0, names=COLUMNS, dtype=str, skip_blank_lines=True)
+        is_data = raw['gtin'].str.fullmatch(r'\d+', na=False) & raw['retries'].notna()
+        meta.setdefault('config', parse_preamble_config(raw.loc[raw['success'].isna(), 'gtin'].dropna()))
+
+        df = raw[is_data].copy()
+        df['status_code'] = pd.to_numeric(df['status_code'], errors='coerce')
+        for column in ('time', 'elapsed'):
+            df[column] = df[column].astype(float)
+        for column in ('retries', 'processed', 'successful'):
+            df[column] = df[column].astype(int)
+
+    df['success'] = df['success'] == 'Sí'
+    meta.setdefault('results_file', os.path.basename(path))
+    return meta, df.reset_index(drop=True)
+
+
+def load_runs(pattern: str = RESULTS_GLOB) -> list:
+    """
+    Carga todas las corridas ordenadas por timestamp (nombre del archivo)
+
+    Returns:
+        list: Tuplas (metadatos, DataFrame) de las corridas con datos
+    """
+    runs = []
+    for path in sorted(glob.glob(pattern)):
+        try:
+            meta, df = load_run(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  No se pudo leer {path}: {e}")
+            continue
+        if not df.empty:
+            runs.append((meta, df))
+    return runs
+
+
+def get_duration(meta: dict, df: pd.DataFrame) -> float:
+    """Duración de la corrida (del sidecar si existe, si no el último tiempo acumulado)"""
+    return meta.get('summary', {}).get('execution_time') or float(df['elapsed'].max())
+
+
+def window_throughputs(df: pd.DataFrame, window: int = THROUGHPUT_WINDOW) -> np.ndarray:
+    """
+    GTINs/s en ventanas consecutivas de `window` GTINs completados
+    """
+    completions = np.sort(df['elapsed'].to_numpy())
+    edges = completions[::window]
+    spans = np.diff(edges)
+    return window / spans[spans > 0]
+
+
+def summarize_run(meta: dict, df: pd.DataFrame) -> dict:
+    """Métricas de una corrida para la tabla comparativa"""
+    config = meta.get('config', {})
+    summary = meta.get('summary', {})
+    times = df['time'].to_numpy()
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    duration = get_duration(meta, df)
+
+    return {
+        'run': meta['results_file'],
+        'workers': config.get('workers'),
+        'chunks': config.get('chunks'),
+        'timeout': config.get('timeout'),
+        'pause': config.get('chunk_pause'),
+        'gtins': len(df),
+        'success_%': df['success'].mean() * 100,
+        'duration_s': duration,
+        'gtins_per_s': len(df) / duration if duration else np.nan,
+        'p50_s': p50,
+        'p90_s': p90,
+        'p99_s': p99,
+        'retry_rate_%': (df['retries'] > 0).mean() * 100,
+        'avg_retries': df['retries'].mean(),
+        'connect_timeouts': summary.get('connect_timeouts', np.nan),
+        'read_timeouts': summary.get('read_timeouts', np.nan)
+    }
+
+
+def mann_whitney_greater(x: np.ndarray, y: np.ndarray) -> float:
+    """
+    Prueba U de Mann-Whitney unilateral (aproximación normal con corrección por empates)
+
+    Returns:
+        float: p-valor de la hipótesis "x tiende a ser mayor que y"
+    """
+    n1, n2 = len(x), len(y)
+    if n1 == 0 or n2 == 0:
+        return float('nan')
+
+    ranks = pd.Series(np.concatenate([x, y])).rank().to_numpy()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+
+    n = n1 + n2
+    tie_counts = pd.Series(np.concatenate([x, y])).value_counts().to_numpy()
+    tie_term = (tie_counts ** 3 - tie_counts).sum() / (n * (n - 1)) if n > 1 else 0
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return 1.0
+
+    # Corrección de continuidad de 0.5
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def detect_regressions(latest, baseline) -> list:
+    """
+    Compara la última corrida con la base
+
+    Returns:
+        list: Diccionarios con métrica, valores, cambio relativo (positivo = empeora), p-valor,
+              si es regresión y si es solo informativa (sin prueba)
+    """
+    (latest_meta, latest_df), (baseline_meta, baseline_df) = latest, baseline
+    checks = []
+
+    # Latencia: ¿la última corrida es más lenta por GTIN? La prueba compara la distribución
+    # completa (se muestra la mediana); el p90 se muestra solo como información
+    latest_times = latest_df['time'].to_numpy()
+    baseline_times = baseline_df['time'].to_numpy()
+    for label, q, tested in (('Latencia (distribución, mediana s)', 50, True), ('Latencia p90 (s)', 90, False)):
+        latest_value = np.percentile(latest_times, q)
+        baseline_value = np.percentile(baseline_times, q)
+        checks.append({
+            'metric': label,
+            'baseline': baseline_value,
+            'latest': latest_value,
+            'change': (latest_value - baseline_value) / baseline_value if baseline_value else np.nan,
+            'p_value': mann_whitney_greater(latest_times, baseline_times) if tested else float('nan'),
+            'informative': not tested
+        })
+
+    # Throughput: ¿la última corrida completa menos GTINs/s?
+    latest_rates = window_throughputs(latest_df)
+    baseline_rates = window_throughputs(baseline_df)
+    latest_value = len(latest_df) / get_duration(latest_meta, latest_df)
+    baseline_value = len(baseline_df) / get_duration(baseline_meta, baseline_df)
+    enough_windows = len(latest_rates) >= 3 and len(baseline_rates) >= 3
+    checks.append({
+        'metric': 'GTINs/s',
+        'baseline': baseline_value,
+        'latest': latest_value,
+        'change': (baseline_value - latest_value) / baseline_value if baseline_value else np.nan,
+        'p_value': mann_whitney_greater(baseline_rates, latest_rates) if enough_windows else float('nan'),
+        'informative': False
+    })
+
+    for check in checks:
+        check['regression'] = bool(check['p_value'] < ALPHA and check['change'] > MIN_EFFECT)
+    return checks
+
+
+def describe_change(change: float) -> str:
+    """Describe un cambio relativo (positivo = empeora) según su signo"""
+    if math.isnan(change):
+        return "cambio n/d"
+    if change > 0:
+        return f"empeora {change*100:.1f}%"
+    if change < 0:
+        return f"mejora {-change*100:.1f}%"
+    return "sin cambios"
+
+
+def select_baseline(runs: list):
+    """Corrida base: BASELINE_RUN si está configurada, si no la penúltima"""
+    if BASELINE_RUN:
+        for run in runs[:-1]:
+            if run[0]['results_file'] == BASELINE_RUN:
+                return run
+        print(f"⚠️  Corrida base no encontrada: {BASELINE_RUN}. Usando la corrida anterior.")
+    return runs[-2]
+
+
+def main():
+    """
+    Función principal: tabla comparativa y detección de regresiones
+    """
+    print("📊 Reporte comparativo de rendimiento")
+    print(f"📁 Corridas: {RESULTS_GLOB}")
+
+    runs = load_runs()
+    if not runs:
+        print("\n❌ No hay corridas con resultados.")
+        return
+
+    table = pd.DataFrame([summarize_run(meta, df) for meta, df in runs])
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.float_format', '{:.2f}'.format):
+        print(f"\n📋 {len(runs)} corridas:")
+        print(table.to_string(index=False))
+
+    report_file = os.path.join(loader.RESULTS_DIR, f"performance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    table.to_csv(report_file, index=False)
+
+    if len(runs) < 2:
+        print("\n⚠️  Se necesitan al menos dos corridas para detectar regresiones.")
+        print(f"\n📄 Reporte guardado en: {report_file}")
+        return
+
+    latest, baseline = runs[-1], select_baseline(runs)
+    print(f"\n🔬 Última corrida: {latest[0]['results_file']} - Base: {baseline[0]['results_file']}")
+    print(f"   (α = {ALPHA}, cambio mínimo = {MIN_EFFECT*100:.0f}%)")
+
+    regressions = 0
+    for check in detect_regressions(latest, baseline):
+        p_value = "solo informativo" if check['informative'] else (
+            "p = n/d" if math.isnan(check['p_value']) else f"p = {check['p_value']:.4f}")
+        status = "ℹ️ " if check['informative'] else ("🔴 REGRESIÓN" if check['regression'] else "🟢 OK")
+        print(f"   {status} {check['metric']}: {check['baseline']:.2f} → {check['latest']:.2f} "
+              f"({describe_change(check['change'])}, {p_value})")
+        regressions += check['regression']
+
+    if regressions:
+        print(f"\n❌ {regressions} regresiones significativas detectadas")
+    else:
+        print("\n✅ Sin regresiones significativas")
+    print(f"\n📄 Reporte guardado en: {report_file}")
+
+
+if __name__ == "__main__":
+    main()
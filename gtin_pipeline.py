@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Extracción y carga de GTINs en un solo paso
+Los GTINs validados por GTINExtractor pasan directamente a los workers del cargador a través
+de una cola acotada, así las primeras peticiones salen mientras el Excel todavía se está leyendo
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import gtin_engineLoader_balanced as loader
+from gtin_extractor import GTINExtractor
+
+# ==================== CONFIGURACIÓN DEL PIPELINE ====================
+EXCEL_FILE = "Productos_a_cargar.xlsx"  # Mismo archivo de entrada que gtin_extractor.py
+
+# Capacidad de la cola entre el extractor y los workers. Cuando se llena, la lectura del Excel
+# se detiene hasta que los workers liberan espacio (backpressure)
+QUEUE_SIZE = loader.NUM_WORKERS * 4
+
+# Marca de fin de la cola para los workers
+END_OF_STREAM = None
+
+
+def produce_gtins(extractor, work_queue, limit, num_workers, stats):
+    """
+    Lee GTINs del Excel y los encola; al terminar encola una marca de fin por worker
+    """
+    try:
+        for gtin in extractor.iter_gtins_from_excel():
+            # put() bloquea mientras la cola está llena
+            work_queue.put(gtin)
+            stats['queued'] += 1
+
+            if stats['queued'] == 1:
+                loader.log_message(f"📤 Primer GTIN encolado a los {time.time() - stats['start_time']:.2f}s")
+
+            if limit and stats['queued'] >= limit:
+                loader.log_message(f"⚠️  Limitando procesamiento a {limit:,} GTINs (configurado en TOTAL_GTINS_TO_PROCESS)")
+                break
+
+        loader.log_message(f"📗 Lectura del Excel terminada: {stats['queued']:,} GTINs encolados "
+                           f"en {time.time() - stats['start_time']:.2f}s")
+    except Exception as e:
+        stats['error'] = e
+        loader.log_message(f"❌ Error leyendo el archivo Excel: {str(e)}")
+    finally:
+        for _ in range(num_workers):
+            work_queue.put(END_OF_STREAM)
+
+
+def consume_gtins(work_queue, results_file, dead_letter, stats, stats_lock):
+    """
+    Worker: procesa GTINs de la cola hasta recibir la marca de fin
+
+    Los errores inesperados de un GTIN se registran y cuentan como fallo, como en
+    process_chunk: un worker nunca sale antes de la marca de fin, o el productor
+    quedaría bloqueado con la cola llena.
+    """
+    while True:
+        gtin = work_queue.get()
+        if gtin is END_OF_STREAM:
+            return
+
+        counted = False
+        try:
+            success, gtin, status_code, processing_time, retries, response_text = loader.process_gtin_with_retry(gtin, dead_letter=dead_letter)
+
+            with stats_lock:
+                stats['processed'] += 1
+                if success:
+                    stats['successful'] += 1
+                else:
+                    stats['failed'] += 1
+                stats['times'].append(processing_time)
+                stats['retries'].append(retries)
+                counted = True
+
+                loader.write_result_row(
+                    results_file, gtin, success, status_code, processing_time, retries,
+                    time.time() - stats['start_time'], stats['processed'], stats['successful'], "Pipeline"
+                )
+
+                if stats['processed'] % 5 == 0:
+                    success_rate = (stats['successful'] / stats['processed']) * 100
+                    loader.log_message(f"📊 Pipeline - Procesados: {stats['processed']:,} - Encolados: {stats['queued']:,} "
+                                       f"- En cola: {work_queue.qsize()} - Éxito: {success_rate:.1f}%")
+
+        except Exception as e:
+            if not counted:
+                with stats_lock:
+                    stats['failed'] += 1
+            message = f"❌ Error inesperado procesando GTIN {gtin} en el pipeline: {str(e)}"
+            try:
+                loader.log_message(message)
+            except Exception:
+                # El propio log puede fallar (p. ej. disco lleno); el worker debe seguir vivo
+                print(message)
+
+
+def main():
+    loader.log_message("🚀 ===== INICIANDO PIPELINE DE EXTRACCIÓN Y CARGA =====")
+
+    if not os.path.exists(EXCEL_FILE):
+        loader.log_message(f"❌ Archivo no encontrado: {EXCEL_FILE}")
+        return
+
+    # Obtener token de autenticación
+    loader.HEADERS = loader.get_auth_token()
+    if not loader.HEADERS:
+        loader.log_message("❌ No se pudo obtener el token de autenticación. Saliendo...")
+        return
+
+    source_description = f"Streaming desde {EXCEL_FILE}"
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    results_file = os.path.join(loader.RESULTS_DIR, f"batch_processing_{timestamp}.csv")
+    dead_letter = loader.DeadLetterQueue(os.path.join(loader.RESULTS_DIR, f"dead_letter_{timestamp}.jsonl"))
+    loader.init_results_file(
+        results_file, source_description, "streaming",
+        f"máximo {loader.TOTAL_GTINS_TO_PROCESS:,}", num_chunks="pipeline"
+    )
+
+    loader.log_message(f"⚙️  Configuración del pipeline:")
+    loader.log_message(f"   📁 Excel: {EXCEL_FILE}")
+    loader.log_message(f"   📊 Máximo de GTINs: {loader.TOTAL_GTINS_TO_PROCESS:,}")
+    loader.log_message(f"   👥 Workers: {loader.NUM_WORKERS}")
+    loader.log_message(f"   📥 Capacidad de la cola: {QUEUE_SIZE}")
+    loader.log_message(f"   🔄 Max reintentos: {loader.MAX_RETRIES}")
+    loader.log_message(f"   ⏱️  Timeout: conexión {loader.CONNECT_TIMEOUT}s, lectura "
+                       f"{f'adaptativo (hasta {loader.TIMEOUT}s)' if loader.ADAPTIVE_READ_TIMEOUT else f'{loader.TIMEOUT}s'}")
+
+    work_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stats_lock = threading.Lock()
+    stats = {
+        'start_time': time.time(),
+        'queued': 0,
+        'processed': 0,
+        'successful': 0,
+        'failed': 0,
+        'times': [],
+        'retries': [],
+        'error': None
+    }
+
+    extractor = GTINExtractor(EXCEL_FILE)
+    producer = threading.Thread(
+        target=produce_gtins,
+        args=(extractor, work_queue, loader.TOTAL_GTINS_TO_PROCESS, loader.NUM_WORKERS, stats),
+        name="GTINExtractor"
+    )
+    workers = [
+        threading.Thread(target=consume_gtins, args=(work_queue, results_file, dead_letter, stats, stats_lock), name=f"Worker-{i + 1}")
+        for i in range(loader.NUM_WORKERS)
+    ]
+
+    # La grabación de tráfico se cierra aunque el pipeline se interrumpa, para que el gzip quede completo
+    loader.start_traffic_recording(timestamp)
+    try:
+        producer.start()
+        for worker in workers:
+            worker.start()
+
+        producer.join()
+        for worker in workers:
+            worker.join()
+    finally:
+        loader.stop_traffic_recording()
+
+    total_execution_time = time.time() - stats['start_time']
+
+    if stats['processed'] == 0:
+        loader.log_message("❌ No se procesó ningún GTIN.")
+        return
+
+    loader.report_final_summary(
+        results_file, timestamp, source_description, stats['queued'], stats['processed'],
+        stats['successful'], stats['failed'], total_execution_time, stats['times'], stats['retries']
+    )
+
+    if dead_letter.count:
+        loader.log_message(f"🪦 {dead_letter.count:,} GTINs enviados a dead-letter: {dead_letter.path}")
+        if loader.ENABLE_REDRIVE:
+            loader.run_redrive(dead_letter.path, timestamp)
+
+    loader.export_trace(timestamp)
+    loader.log_message("🎉 ===== FIN DEL PIPELINE =====")
+
+
+if __name__ == "__main__":
+    main()
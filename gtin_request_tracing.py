@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Trazas por fase de las peticiones del procesador de GTINs
+Registra conexión, envío, tiempo hasta el primer byte, descarga, esperas de reintento
+y escritura de CSV por GTIN y worker, y las exporta en formato Chrome Trace
+(abrir en chrome://tracing o https://ui.perfetto.dev)
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Contexto de traza del hilo actual (tracer activo y argumentos del GTIN en curso)
+_trace_context = threading.local()
+
+
+@contextmanager
+def _phase_span(name: str):
+    """Registra una fase de bajo nivel si el hilo actual tiene una traza activa"""
+    tracer = getattr(_trace_context, "tracer", None)
+    if tracer is None:
+        yield
+        return
+
+    with tracer.span(name):
+        yield
+
+
+class _TracedConnectionMixin:
+    """
+    Mide las fases de una conexión de urllib3. La conexión se abre de forma perezosa, así que
+    en conexiones HTTP nuevas la fase "connect" aparece anidada dentro de "send".
+    """
+    def connect(self):
+        with _phase_span("connect"):
+            return super().connect()
+
+    def request(self, *args, **kwargs):
+        with _phase_span("send"):
+            return super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        # Bloquea hasta recibir la línea de estado y las cabeceras
+        with _phase_span("ttfb"):
+            return super().getresponse(*args, **kwargs)
+
+
+class _TracedHTTPConnection(_TracedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TracedHTTPSConnection(_TracedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TracedHTTPConnection
+
+
+class _TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TracedHTTPSConnection
+
+
+class TracedHTTPAdapter(HTTPAdapter):
+    """Adaptador de requests que usa conexiones instrumentadas"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TracedHTTPConnectionPool,
+            "https": _TracedHTTPSConnectionPool
+        }
+
+
+class RequestTracer:
+    """
+    Recolector de spans compartido por todos los workers
+    """
+    def __init__(self, process_name: str = "GTIN loader"):
+        self.process_name = process_name
+        self._lock = threading.Lock()
+        self._events = []
+        self._thread_names = {}
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def context(self, **args):
+        """
+        Asocia los spans del hilo actual a un GTIN/intento mientras dure el bloque
+        """
+        previous_tracer = getattr(_trace_context, "tracer", None)
+        previous_args = getattr(_trace_context, "args", {})
+
+        _trace_context.tracer = self
+        _trace_context.args = {**previous_args, **args}
+        try:
+            yield
+        finally:
+            _trace_context.tracer = previous_tracer
+            _trace_context.args = previous_args
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """
+        Registra un span con la duración del bloque. Si el bloque lanza una excepción
+        se anota su tipo en los argumentos del span.
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            span_args = {**getattr(_trace_context, "args", {}), **args}
+            if error:
+                span_args["error"] = error
+            self.record(name, start, end, **span_args)
+
+    def record(self, name: str, start: float, end: float, **args):
+        """Registra un span a partir de instantes de time.perf_counter()"""
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": "gtin",
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": 1,
+            "tid": thread.ident,
+            "args": args
+        }
+
+        with self._lock:
+            self._events.append(event)
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """
+        Equivalente a requests.post con las fases de red instrumentadas.
+        Como requests.post, usa una sesión nueva (y por tanto una conexión nueva) por petición.
+        """
+        with requests.Session() as session:
+            adapter = TracedHTTPAdapter()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            response = session.post(url, stream=True, **kwargs)
+            with self.span("download"):
+                response.content
+            return response
+
+    def export_chrome_trace(self, path: str) -> int:
+        """
+        Guarda los spans en formato Chrome Trace Event (JSON)
+
+        Returns:
+            int: Número de spans exportados
+        """
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+
+        metadata = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": self.process_name}}]
+        for tid, thread_name in thread_names.items():
+            metadata.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread_name}})
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+        return len(events)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Planificador de corridas para el procesador de GTINs
+Simula por eventos discretos el reparto en chunks, workers, reintentos y backoff
+del cargador usando las distribuciones de latencia y error de corridas anteriores
+"""
+
+import heapq
+import os
+import random
+import statistics
+from collections import deque
+
+import gtin_engineLoader_balanced as loader
+from gtin_performance_report import load_runs
+
+# ==================== CONFIGURACIÓN DEL PLANIFICADOR ====================
+# CSVs de corridas anteriores generados por gtin_engineLoader_balanced.py
+HISTORY_GLOB = os.path.join(loader.RESULTS_DIR, "batch_processing_*.csv")
+
+# Tamaño de la carga que se quiere planificar
+PLANNED_GTINS = loader.TOTAL_GTINS_TO_PROCESS
+
+# Tasa máxima de GTINs fallidos (tras agotar reintentos) aceptada
+TARGET_ERROR_RATE = 0.05
+
+# Configuraciones candidatas a evaluar. CHUNK_PAUSE no se evalúa: el modelo no incluye la
+# recuperación del servidor entre chunks, así que una pausa solo añadiría tiempo simulado.
+# Todas las candidatas se simulan con el CHUNK_PAUSE actual
+CANDIDATE_WORKERS = [2, 4, 6, 8]
+CANDIDATE_CHUNKS = [1, 3, 5]
+
+# Repeticiones de la simulación por configuración (Monte Carlo)
+SIMULATION_RUNS = 20
+RANDOM_SEED = 42
+
+
+class LatencyModel:
+    """
+    Distribuciones empíricas de una corrida (o grupo de corridas) con el mismo número de workers
+
+    Los fallos se concentran en los mismos GTINs (los que acaban en la dead-letter), así que se
+    muestrea el resultado completo de un GTIN observado (éxito y reintentos) en lugar de
+    intentos independientes.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.rows = []
+        self.success_times = []
+        self.failure_times = []
+        self.failure_status_codes = []
+        self.classified_500s = 0
+        self.queue_pool_500s = 0
+        self.attempts = 0
+        self.failed_attempts = 0
+        self.runs = 0
+
+    def add_row(self, success: bool, status_code, processing_time: float, retries: int):
+        """
+        Añade una fila de resultados. El CSV guarda el tiempo del último intento y el número de
+        reintentos, así que cada fila aporta retries + 1 intentos de los cuales solo el último
+        puede ser exitoso.
+        """
+        attempts = retries + 1
+        self.rows.append((success, status_code, processing_time, retries))
+        self.attempts += attempts
+        if success:
+            self.success_times.append(processing_time)
+            self.failed_attempts += attempts - 1
+        else:
+            self.failure_times.append(processing_time)
+            self.failure_status_codes.append(status_code)
+            self.failed_attempts += attempts
+
+    def add_dead_letter(self, entries: list):
+        """
+        Añade las entradas de la dead-letter de una corrida. El CSV solo guarda el código de
+        estado; la dead-letter indica si un 500 fue un error de QueuePool.
+        """
+        for entry in entries:
+            if entry.get("status_code") == 500:
+                self.classified_500s += 1
+                self.queue_pool_500s += entry.get("error_class") == "QueuePool"
+
+    @property
+    def queue_pool_share(self) -> float:
+        """Fracción de los 500 que fueron errores de QueuePool (0 si nunca se observó ninguno)"""
+        return self.queue_pool_500s / self.classified_500s if self.classified_500s else 0.0
+
+    @property
+    def failure_probability(self) -> float:
+        """Probabilidad de que un intento individual falle"""
+        return self.failed_attempts / self.attempts if self.attempts else 0.0
+
+    @property
+    def observed_error_rate(self) -> float:
+        """Fracción de GTINs que agotaron sus reintentos en las corridas observadas"""
+        return len(self.failure_times) / len(self.rows) if self.rows else 0.0
+
+    def sample_gtin(self, rng: random.Random, max_retries: int) -> list:
+        """
+        Muestrea los intentos de un GTIN a partir de una fila observada
+
+        El CSV solo guarda el último intento: los intentos fallidos previos de un GTIN fallido
+        repiten su código y latencia, y los de un GTIN exitoso se muestrean de los fallos
+        observados. Con menos reintentos que en el historial un éxito tardío pasa a ser fallo;
+        con más, un GTIN fallido sigue fallando.
+
+        Returns:
+            list: Intentos (éxito, código de estado, latencia en segundos); solo el último puede ser exitoso
+        """
+        success, status_code, latency, retries = rng.choice(self.rows)
+
+        if success:
+            attempts = [self._sample_failed_attempt(rng) for _ in range(retries)]
+            attempts.append((True, status_code, latency))
+            return attempts[:max_retries]
+        return [(False, status_code, latency)] * max_retries
+
+    def _sample_failed_attempt(self, rng: random.Random):
+        # Si nunca se observó un fallo final, reutilizar las latencias de éxito
+        latency = rng.choice(self.failure_times or self.success_times)
+        status_code = rng.choice(self.failure_status_codes) if self.failure_status_codes else None
+        return False, status_code, latency
+
+
+def get_dead_letter_name(results_file: str) -> str:
+    """Nombre de la dead-letter de una corrida (batch_processing_<ts>.csv -> dead_letter_<ts>.jsonl)"""
+    timestamp = os.path.splitext(results_file)[0].replace("batch_processing_", "", 1)
+    return f"dead_letter_{timestamp}.jsonl"
+
+
+def load_history(pattern: str = HISTORY_GLOB) -> dict:
+    """
+    Construye un modelo de latencia por número de workers a partir de corridas anteriores
+
+    Returns:
+        dict: {workers: LatencyModel}
+    """
+    models = {}
+
+    for meta, df in load_runs(pattern):
+        workers = meta.get('config', {}).get('workers')
+        if not isinstance(workers, int):
+            continue
+
+        model = models.setdefault(workers, LatencyModel(workers))
+        model.runs += 1
+        status_codes = df['status_code'].astype('Int64').astype(object).where(df['status_code'].notna(), None)
+        for row in zip(df['success'], status_codes, df['time'], df['retries']):
+            model.add_row(*row)
+
+        dead_letter_file = os.path.join(os.path.dirname(pattern), get_dead_letter_name(meta['results_file']))
+        if os.path.exists(dead_letter_file):
+            try:
+                model.add_dead_letter(loader.DeadLetterQueue.load(dead_letter_file))
+            except (OSError, ValueError) as e:
+                print(f"⚠️  No se pudo leer {dead_letter_file}: {e}")
+
+    # Un modelo sin ningún éxito no permite muestrear latencias
+    return {workers: model for workers, model in models.items() if model.success_times}
+
+
+def select_model(models: dict, workers: int):
+    """
+    Devuelve el modelo observado con el número de workers más cercano
+
+    Returns:
+        LatencyModel: Modelo seleccionado
+        bool: True si la configuración no se ha observado (extrapolación)
+    """
+    closest = min(models, key=lambda observed: (abs(observed - workers), observed))
+    return models[closest], closest != workers
+
+
+def simulate_run(model: LatencyModel, total_gtins: int, workers: int, num_chunks: int,
+                 chunk_pause: float, max_retries: int, rng: random.Random) -> dict:
+    """
+    Simula una corrida completa del cargador
+
+    Cada chunk se procesa con un pool de `workers` hilos que toman GTINs en orden FIFO.
+    Un hilo queda ocupado durante la petición y durante la espera de backoff entre reintentos,
+    igual que en process_gtin_with_retry. Los intentos de cada GTIN salen de una fila observada
+    (LatencyModel.sample_gtin), así que la tasa de fallos final reproduce la del historial. Un 500 solo recibe el backoff de QueuePool con la
+    frecuencia observada en las dead-letters; el resto usa la espera progresiva. Entre chunks
+    se aplica la pausa configurada (sin efecto sobre la latencia del servidor).
+
+    Returns:
+        dict: Duración, GTINs fallidos y concurrencia observada en el servidor
+    """
+    chunks, _ = loader.split_into_chunks(range(total_gtins), num_chunks)
+
+    clock = 0.0
+    failed = 0
+    in_flight_area = 0.0
+    peak_in_flight = 0
+    sequence = 0
+
+    for chunk_idx, chunk in enumerate(chunks):
+        pending = deque(chunk)
+        events = []
+        in_flight = 0
+        last_event_time = clock
+
+        def send_attempt(now, attempts, attempt):
+            nonlocal in_flight, peak_in_flight, sequence
+            latency = attempts[attempt][2]
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+            sequence += 1
+            heapq.heappush(events, (now + latency, sequence, "response", attempts, attempt))
+
+        def start_gtin(now):
+            pending.popleft()
+            send_attempt(now, model.sample_gtin(rng, max_retries), 0)
+
+        # Arrancar tantos GTINs como workers haya disponibles
+        for _ in range(min(workers, len(pending))):
+            start_gtin(clock)
+
+        while events:
+            now, _, kind, attempts, attempt = heapq.heappop(events)
+            in_flight_area += in_flight * (now - last_event_time)
+            last_event_time = now
+
+            if kind == "retry":
+                send_attempt(now, attempts, attempt)
+                continue
+
+            in_flight -= 1
+            success, status_code, _ = attempts[attempt]
+            if not success and attempt < len(attempts) - 1:
+                # El hilo sigue ocupado durmiendo hasta el siguiente intento
+                is_queue_pool = status_code == 500 and rng.random() < model.queue_pool_share
+                response_text = "QueuePool limit" if is_queue_pool else ""
+                wait_time = loader.compute_retry_wait(attempt, status_code, response_text)
+                sequence += 1
+                heapq.heappush(events, (now + wait_time, sequence, "retry", attempts, attempt + 1))
+                continue
+
+            if not success:
+                failed += 1
+
+            # El hilo queda libre y toma el siguiente GTIN del chunk
+            if pending:
+                start_gtin(now)
+
+        clock = last_event_time
+        if chunk_idx < len(chunks) - 1:
+            clock += chunk_pause
+
+    return {
+        'duration': clock,
+        'failed': failed,
+        'error_rate': failed / total_gtins if total_gtins else 0.0,
+        'avg_concurrency': in_flight_area / clock if clock else 0.0,
+        'peak_concurrency': peak_in_flight
+    }
+
+
+def evaluate_configuration(models: dict, total_gtins: int, workers: int, num_chunks: int,
+                           chunk_pause: float, runs: int = SIMULATION_RUNS, seed: int = RANDOM_SEED) -> dict:
+    """
+    Repite la simulación de una configuración y agrega los resultados
+    """
+    model, extrapolated = select_model(models, workers)
+    rng = random.Random(seed)
+
+    simulations = [
+        simulate_run(model, total_gtins, workers, num_chunks, chunk_pause, loader.MAX_RETRIES, rng)
+        for _ in range(runs)
+    ]
+    durations = sorted(sim['duration'] for sim in simulations)
+
+    return {
+        'workers': workers,
+        'chunks': num_chunks,
+        'pause': chunk_pause,
+        'model_workers': model.workers,
+        'extrapolated': extrapolated,
+        'duration_mean': statistics.mean(durations),
+        'duration_p90': durations[min(len(durations) - 1, int(0.9 * len(durations)))],
+        'error_rate': statistics.mean(sim['error_rate'] for sim in simulations),
+        'observed_error_rate': model.observed_error_rate,
+        'avg_concurrency': statistics.mean(sim['avg_concurrency'] for sim in simulations),
+        'peak_concurrency': max(sim['peak_concurrency'] for sim in simulations)
+    }
+
+
+def recommend_configuration(results: list, target_error_rate: float = TARGET_ERROR_RATE):
+    """
+    Elige la configuración más rápida que cumple la tasa de error objetivo
+
+    Se prefieren números de workers ya observados: la tasa de error de una concurrencia
+    no observada (p. ej. errores de QueuePool) no se puede predecir con el historial.
+
+    Returns:
+        dict: Configuración recomendada (la de menor error si ninguna cumple el objetivo)
+        bool: True si la recomendación cumple el objetivo
+    """
+    eligible = [result for result in results if result['error_rate'] <= target_error_rate]
+    if eligible:
+        return min(eligible, key=lambda result: (result['extrapolated'], result['duration_mean'])), True
+    return min(results, key=lambda result: (result['error_rate'], result['duration_mean'])), False
+
+
+def format_result(result: dict) -> str:
+    """Formatea una fila de la tabla de resultados"""
+    note = f" (modelo de {result['model_workers']} workers)" if result['extrapolated'] else ""
+    return (f"   👥 {result['workers']:>2} | 📦 {result['chunks']:>2} | ⏸️  {result['pause']:>3}s | "
+            f"⏱️  {result['duration_mean']/60:7.2f} min (p90 {result['duration_p90']/60:7.2f}) | "
+            f"❌ {result['error_rate']*100:5.1f}% (obs. {result['observed_error_rate']*100:.1f}%) | "
+            f"🔌 {result['avg_concurrency']:.1f} prom / {result['peak_concurrency']} máx{note}")
+
+
+def main():
+    """
+    Función principal: simula la configuración actual y las candidatas
+    """
+    print("🧭 Planificador de corridas del procesador de GTINs")
+    print(f"📁 Historial: {HISTORY_GLOB}")
+
+    models = load_history()
+    if not models:
+        print("\n❌ No hay corridas anteriores con resultados válidos.")
+        print("Ejecuta gtin_engineLoader_balanced.py al menos una vez.")
+        return
+
+    print("\n📊 Modelos construidos:")
+    for workers, model in sorted(models.items()):
+        print(f"   • {workers} workers: {model.runs} corridas, {len(model.success_times) + len(model.failure_times):,} GTINs, "
+              f"latencia mediana {statistics.median(model.success_times):.2f}s, "
+              f"GTINs fallidos {model.observed_error_rate*100:.1f}%, "
+              f"fallo por intento {model.failure_probability*100:.1f}%, "
+              f"QueuePool en {model.queue_pool_share*100:.0f}% de los 500")
+
+    print(f"\n🎯 GTINs a planificar: {PLANNED_GTINS:,} - Tasa de error objetivo: {TARGET_ERROR_RATE*100:.1f}%")
+
+    print(f"⏸️  CHUNK_PAUSE no se modela (sin recuperación del servidor): se usa el actual ({loader.CHUNK_PAUSE}s)")
+
+    current = evaluate_configuration(models, PLANNED_GTINS, loader.NUM_WORKERS, loader.NUM_CHUNKS, loader.CHUNK_PAUSE)
+    print("\n⚙️  Configuración actual:")
+    print(format_result(current))
+
+    results = [
+        evaluate_configuration(models, PLANNED_GTINS, workers, num_chunks, loader.CHUNK_PAUSE)
+        for workers in CANDIDATE_WORKERS
+        for num_chunks in CANDIDATE_CHUNKS
+    ]
+
+    print("\n🔬 Configuraciones candidatas:")
+    for result in sorted(results, key=lambda result: result['duration_mean']):
+        print(format_result(result))
+
+    best, meets_target = recommend_configuration(results)
+    print("\n✅ Configuración recomendada:" if meets_target else
+          "\n⚠️  Ninguna configuración cumple el objetivo, la de menor error es:")
+    print(format_result(best))
+    print(f"   NUM_WORKERS = {best['workers']}")
+    print(f"   NUM_CHUNKS = {best['chunks']}")
+    print(f"   TOTAL_GTINS_TO_PROCESS = {PLANNED_GTINS}")
+
+
+if __name__ == "__main__":
+    main()
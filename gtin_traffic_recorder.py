@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Grabación del flujo de peticiones del procesador de GTINs
+Guarda cada intento (GTIN, payload, instante de envío y resultado) en un JSONL comprimido
+con gzip para reproducirlo después con gtin_traffic_replay.py
+"""
+
+import gzip
+import json
+import threading
+import time
+from datetime import datetime
+
+# Volcado periódico del buffer de gzip: una corrida interrumpida conserva lo grabado hasta
+# el último volcado
+FLUSH_EVERY = 50              # Peticiones grabadas entre volcados
+FLUSH_INTERVAL = 5            # Segundos máximos entre volcados
+
+
+class TrafficRecorder:
+    """
+    Grabación compacta (JSONL comprimido con gzip) del flujo de peticiones de una corrida
+
+    La primera línea es una cabecera con la URL y la configuración; cada línea siguiente es un
+    intento con su instante de envío relativo al inicio de la grabación.
+    """
+    def __init__(self, path: str, api_url: str, **config):
+        self.path = path
+        self.count = 0
+        self._start_time = time.time()
+        self._last_flush = self._start_time
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({
+            "type": "header",
+            "api_url": api_url,
+            "started": datetime.now().isoformat(timespec='seconds'),
+            **config
+        })
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def record(self, gtin, payload, sent_at, attempt, status_code, latency, error_class):
+        """Registra un intento; sent_at es el time.time() del envío"""
+        entry = {
+            "gtin": gtin,
+            "payload": payload,
+            "offset": round(sent_at - self._start_time, 3),
+            "attempt": attempt,
+            "status": status_code,
+            "latency": round(latency, 3),
+            "error": error_class
+        }
+        with self._lock:
+            # Peticiones que terminan después de cerrar la grabación (corrida interrumpida)
+            if self._file.closed:
+                return
+            self._write(entry)
+            self.count += 1
+
+            now = time.time()
+            if self.count % FLUSH_EVERY == 0 or now - self._last_flush >= FLUSH_INTERVAL:
+                # Z_SYNC_FLUSH: lo escrito hasta aquí se puede descomprimir aunque el proceso muera
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    @staticmethod
+    def load(path: str):
+        """
+        Lee una grabación. Si la grabación quedó truncada (corrida interrumpida antes de
+        cerrarla) se devuelven las peticiones completas anteriores al corte.
+
+        Returns:
+            dict: Cabecera de la grabación
+            list: Peticiones ordenadas por instante de envío
+        """
+        header = {}
+        requests_recorded = []
+        partial_line = None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    # Una línea incompleta solo es aceptable al final del archivo
+                    if partial_line is not None:
+                        raise partial_line
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        partial_line = e
+                        continue
+
+                    if entry.get("type") == "header":
+                        header = entry
+                    else:
+                        requests_recorded.append(entry)
+            except EOFError:
+                # Flujo gzip sin marca de fin: se conserva lo leído hasta el último volcado
+                pass
+
+        requests_recorded.sort(key=lambda entry: entry["offset"])
+        return header, requests_recorded
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Reproducción de tráfico grabado para pruebas de carga del API de descripciones
+Reenvía el flujo de peticiones de una corrida (grabado con RECORD_TRAFFIC) contra un servidor
+destino a ritmo original, escalado o fijo, y detecta los puntos de saturación del servidor
+"""
+
+import concurrent.futures
+import csv
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+
+import gtin_engineLoader_balanced as loader
+from gtin_traffic_recorder import TrafficRecorder
+
+# ==================== CONFIGURACIÓN DE LA REPRODUCCIÓN ====================
+# Grabación a reproducir. None = la más reciente de RESULTS_DIR
+REPLAY_FILE = None
+
+# Servidor destino (por ejemplo una réplica local del backend)
+TARGET_URL = "http://127.0.0.1:8000/api/v1/product/description/generate"
+USE_AUTH = True               # Obtener token de Auth0 como el cargador
+
+# Modo de reproducción:
+#   "original": mismos instantes de envío que la grabación
+#   "scaled":   instantes divididos por cada factor de SCALE_FACTORS (2 = doble de carga)
+#   "fixed":    peticiones a ritmo constante, un nivel por cada valor de FIXED_RATES (peticiones/s)
+REPLAY_MODE = "scaled"
+SCALE_FACTORS = [1, 2, 5]
+FIXED_RATES = [0.5, 1, 2, 4]
+
+# Límite de peticiones simultáneas del cliente. Si se alcanza, los envíos se retrasan
+# y el retraso se reporta (el cliente, no el servidor, sería el cuello de botella)
+MAX_CONCURRENCY = 64
+REPLAY_TIMEOUT = (loader.CONNECT_TIMEOUT, loader.TIMEOUT)
+
+# Pausa entre niveles de carga para que el servidor se recupere
+LEVEL_PAUSE = 30
+
+# Rodilla de latencia: primer nivel cuya mediana efectiva supera KNEE_FACTOR x la del nivel más bajo.
+# La latencia efectiva cuenta las peticiones fallidas como no servidas (latencia = timeout de lectura):
+# bajo saturación el backend falla rápido con QueuePool y las peticiones exitosas pueden ser más rápidas
+KNEE_FACTOR = 1.5
+
+
+def find_latest_recording():
+    """Grabación más reciente en RESULTS_DIR (None si no hay)"""
+    recordings = sorted(glob.glob(os.path.join(loader.RESULTS_DIR, "traffic_*.jsonl.gz")))
+    return recordings[-1] if recordings else None
+
+
+def build_schedules(recorded):
+    """
+    Calcula los niveles de carga a reproducir según REPLAY_MODE
+
+    Returns:
+        list: Tuplas (nombre del nivel, lista de instantes de envío relativos en segundos)
+    """
+    offsets = np.array([entry["offset"] for entry in recorded], dtype=float)
+    offsets -= offsets[0]
+
+    if REPLAY_MODE == "original":
+        return [("original", offsets)]
+    if REPLAY_MODE == "scaled":
+        return [(f"x{factor:g}", offsets / factor) for factor in SCALE_FACTORS]
+    if REPLAY_MODE == "fixed":
+        return [(f"{rate:g} req/s", np.arange(len(recorded)) / rate) for rate in FIXED_RATES]
+    raise ValueError(f"REPLAY_MODE desconocido: {REPLAY_MODE}")
+
+
+def send_request(entry, scheduled_at, headers, in_flight):
+    """
+    Envía una petición grabada y mide su resultado
+
+    Returns:
+        dict: Resultado de la petición (latencia, estado, tipo de error, retraso de envío)
+    """
+    sent_at = time.time()
+    with in_flight['lock']:
+        in_flight['current'] += 1
+        concurrency = in_flight['current']
+        in_flight['peak'] = max(in_flight['peak'], concurrency)
+
+    status_code = None
+    error_class = None
+    try:
+        response = requests.post(TARGET_URL, headers=headers, json=entry["payload"], timeout=REPLAY_TIMEOUT)
+        status_code = response.status_code
+        if not 200 <= status_code < 300:
+            error_class = loader.classify_failure(status_code, response.text[:200])
+    except Exception as e:
+        error_class = loader.classify_failure(None, str(e), e)
+    finally:
+        with in_flight['lock']:
+            in_flight['current'] -= 1
+
+    completed_at = time.time()
+    return {
+        'sent_at': sent_at,
+        'completed_at': completed_at,
+        'latency': completed_at - sent_at,
+        'lag': sent_at - scheduled_at,
+        'concurrency': concurrency,
+        'status': status_code,
+        'error': error_class
+    }
+
+
+def run_level(name, recorded, schedule, headers):
+    """
+    Reproduce un nivel de carga en lazo abierto: cada petición sale en su instante
+    programado sin esperar a que terminen las anteriores
+
+    Returns:
+        dict: Métricas del nivel
+    """
+    loader.log_message(f"▶️  Nivel {name}: {len(recorded):,} peticiones en {schedule[-1]:.1f}s programados")
+
+    in_flight = {'lock': threading.Lock(), 'current': 0, 'peak': 0}
+    start_time = time.time()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        futures = []
+        for entry, offset in zip(recorded, schedule):
+            scheduled_at = start_time + offset
+            delay = scheduled_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(send_request, entry, scheduled_at, headers, in_flight))
+        results = [future.result() for future in futures]
+
+    ok_latencies = np.array([result['latency'] for result in results if result['error'] is None])
+    effective_latencies = np.array([
+        result['latency'] if result['error'] is None else REPLAY_TIMEOUT[1] for result in results
+    ])
+    errors = [result['error'] for result in results if result['error'] is not None]
+    duration = max(result['completed_at'] for result in results) - start_time
+    # Percentiles solo de las exitosas (NaN si ninguna) y efectivos con los fallos como timeout
+    p50, p95, p99 = np.percentile(ok_latencies, [50, 95, 99]) if len(ok_latencies) else (np.nan,) * 3
+    effective_p50, effective_p95 = np.percentile(effective_latencies, [50, 95])
+
+    metrics = {
+        'level': name,
+        'requests': len(results),
+        # N peticiones ocupan N - 1 intervalos del calendario
+        'offered_rps': (len(results) - 1) / schedule[-1] if len(results) > 1 and schedule[-1] > 0 else np.nan,
+        'achieved_rps': len(results) / duration if duration > 0 else np.nan,
+        'p50_s': p50,
+        'p95_s': p95,
+        'p99_s': p99,
+        'effective_p50_s': effective_p50,
+        'effective_p95_s': effective_p95,
+        'error_%': len(errors) / len(results) * 100,
+        'queuepool_errors': errors.count("QueuePool"),
+        'timeouts': sum(error in ("ConnectTimeout", "ReadTimeout") for error in errors),
+        'peak_concurrency': in_flight['peak'],
+        'avg_send_lag_s': float(np.mean([result['lag'] for result in results]))
+    }
+
+    loader.log_message(f"   📊 {metrics['achieved_rps']:.2f} req/s - p50 {p50:.2f}s (efectivo {effective_p50:.2f}s) - p99 {p99:.2f}s - "
+                       f"errores {metrics['error_%']:.1f}% (QueuePool: {metrics['queuepool_errors']}) - "
+                       f"concurrencia máx {metrics['peak_concurrency']}")
+    return metrics
+
+
+def detect_saturation(levels):
+    """
+    Busca la rodilla de latencia y el inicio de errores de QueuePool al aumentar la carga
+
+    Returns:
+        dict: Nivel de la rodilla y del primer error de QueuePool (None si no se alcanzan)
+    """
+    ordered = sorted(levels, key=lambda level: level['offered_rps'])
+    base_p50 = ordered[0]['effective_p50_s']
+
+    knee = next((level for level in ordered[1:] if level['effective_p50_s'] > KNEE_FACTOR * base_p50), None)
+    queuepool = next((level for level in ordered if level['queuepool_errors'] > 0), None)
+    return {'knee': knee, 'queuepool': queuepool}
+
+
+def main():
+    loader.log_message("🚀 ===== INICIANDO REPRODUCCIÓN DE TRÁFICO =====")
+
+    replay_file = REPLAY_FILE or find_latest_recording()
+    if not replay_file or not os.path.exists(replay_file):
+        loader.log_message("❌ No hay grabación de tráfico. Ejecuta el cargador con RECORD_TRAFFIC = True.")
+        return
+
+    header, recorded = TrafficRecorder.load(replay_file)
+    if len(recorded) < 2:
+        loader.log_message(f"❌ La grabación necesita al menos 2 peticiones para calcular un ritmo: {replay_file}")
+        return
+
+    headers = {"Content-Type": "application/json"}
+    if USE_AUTH:
+        headers = loader.get_auth_token()
+        if not headers:
+            loader.log_message("❌ No se pudo obtener el token de autenticación. Saliendo...")
+            return
+
+    loader.log_message(f"📼 Grabación: {replay_file} ({len(recorded):,} peticiones, origen {header.get('api_url')})")
+    loader.log_message(f"🎯 Destino: {TARGET_URL}")
+    loader.log_message(f"⚙️  Modo: {REPLAY_MODE} - Concurrencia máxima del cliente: {MAX_CONCURRENCY}")
+
+    levels = []
+    schedules = build_schedules(recorded)
+    for idx, (name, schedule) in enumerate(schedules):
+        levels.append(run_level(name, recorded, schedule, headers))
+        if idx < len(schedules) - 1:
+            loader.log_message(f"⏸️  Pausa de {LEVEL_PAUSE} segundos antes del siguiente nivel...")
+            time.sleep(LEVEL_PAUSE)
+
+    saturation = detect_saturation(levels)
+
+    loader.log_message("\n🎯 ===== PUNTOS DE SATURACIÓN =====")
+    if saturation['knee']:
+        knee = saturation['knee']
+        loader.log_message(f"📈 Rodilla de latencia en nivel {knee['level']} ({knee['offered_rps']:.2f} req/s ofrecidas): "
+                           f"p50 efectivo {knee['effective_p50_s']:.2f}s, errores {knee['error_%']:.1f}%")
+    else:
+        loader.log_message(f"📈 Sin rodilla de latencia (p50 efectivo < {KNEE_FACTOR}x del nivel más bajo)")
+
+    if saturation['queuepool']:
+        onset = saturation['queuepool']
+        loader.log_message(f"🔄 Primeros errores de QueuePool en nivel {onset['level']} "
+                           f"({onset['offered_rps']:.2f} req/s ofrecidas): {onset['queuepool_errors']} errores")
+    else:
+        loader.log_message("🔄 Sin errores de QueuePool en ningún nivel")
+
+    if any(level['peak_concurrency'] >= MAX_CONCURRENCY for level in levels):
+        loader.log_message(f"⚠️  Se alcanzó MAX_CONCURRENCY ({MAX_CONCURRENCY}): revisa avg_send_lag_s, "
+                           f"el cliente pudo limitar la carga ofrecida")
+
+    report_file = os.path.join(loader.RESULTS_DIR, f"replay_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    with open(report_file, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(levels[0].keys()))
+        writer.writeheader()
+        writer.writerows(levels)
+
+    loader.log_message(f"\n📄 Reporte guardado en: {report_file}")
+    loader.log_message("🎉 ===== FIN DE REPRODUCCIÓN =====")
+
+
+if __name__ == "__main__":
+    main()